@@ -1,12 +1,9 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.ticker import ScalarFormatter
 import numpy as np
+from numba import njit, prange
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
 
 st.set_page_config(page_title="Sieve Analysis Tool", layout="centered")
 st.title("🔬 Sieve Analysis Web App")
@@ -17,7 +14,126 @@ sieve_sizes = [4.75, 2.36, 1.18, 0.6, 0.3, 0.15, 0.075, 0.0]
 
 user_input = st.text_input("Weight retained in grams (e.g. 28, 42, ...)", "")
 
-def create_pdf(df, D10, D30, D60, Cu, Cc, classification, plot_fig):
+# Per-sample arithmetic shared by analyze and batch_analyze. fp is the sieve sizes reversed,
+# since np.interp needs increasing x; valid is False when the total weight isn't positive or
+# % Passing doesn't decrease with size. Never raises, so it is safe inside a prange loop.
+@njit(cache=True)
+def analyze_sample(w, fp):
+    total = w.sum()
+    if not (np.isfinite(total) and total > 0):
+        nan = np.full_like(w, np.nan)
+        return nan, nan, nan, np.full(3, np.nan), False
+
+    pct = w * (100.0 / total)
+    cum = np.cumsum(pct)
+    passing = 100.0 - cum
+
+    xp = passing[::-1].copy()
+    valid = True
+    for i in range(xp.size - 1):
+        if xp[i + 1] < xp[i]:
+            valid = False
+    D = np.interp(np.array([10.0, 30.0, 60.0]), xp, fp)
+    return pct, cum, passing, D, valid
+
+# Compiled once and cached on disk so Streamlit reruns don't pay the JIT cost again
+@njit(cache=True)
+def analyze(w, s):
+    total = w.sum()
+    if not (np.isfinite(total) and total > 0):
+        raise ValueError("Total weight must be positive.")
+    pct, cum, passing, D, valid = analyze_sample(w, s[::-1].copy())
+    if not valid:
+        raise ValueError("% Passing must decrease with sieve size; check the weights and sieve order.")
+    return pct, cum, passing, D[0], D[1], D[2]
+
+# One sample per row of W, spread across cores. Returns D10, D30, D60 per row;
+# rows with no positive total weight or whose % Passing doesn't decrease with sieve size
+# come back as NaN.
+@njit(parallel=True, cache=True)
+def batch_analyze(W, s):
+    N = W.shape[0]
+    out = np.full((N, 3), np.nan)
+    fp = s[::-1].copy()
+    for i in prange(N):
+        D, valid = analyze_sample(W[i], fp)[3:]
+        if valid:
+            out[i, :] = D
+    return out
+
+# Branchless divide: zero diameters give inf instead of raising. Works on scalars or per-sample arrays.
+def coefficients(D10, D30, D60):
+    D10, D30, D60 = np.asarray(D10), np.asarray(D30), np.asarray(D60)
+    Cu = np.divide(D60, D10, out=np.full(D10.shape, np.inf), where=D10 != 0)
+    Cc = np.divide(D30 * D30, D10 * D60, out=np.full(D10.shape, np.inf), where=(D10 != 0) & (D60 != 0))
+    return Cu, Cc
+
+# Inputs are tuples so Streamlit can hash them and skip recomputation on reruns
+@st.cache_data
+def compute_sieve(weights, sieves):
+    w = np.asarray(weights, dtype=np.float64)
+    pct, cum, passing, D10, D30, D60 = analyze(w, np.asarray(sieves, dtype=np.float64))
+
+    # Plain column dict; st.dataframe displays it directly without pandas
+    cols = {
+        'Sieve Size (mm)': np.asarray(sieves, dtype=np.float64),
+        'Weight Retained (g)': w,
+        '% Retained': pct,
+        'Cumulative % Retained': cum,
+        '% Passing': passing
+    }
+
+    Cu, Cc = (c.item() for c in coefficients(D10, D30, D60))
+
+    return cols, D10, D30, D60, Cu, Cc
+
+def make_fig(sizes, passing):
+    # Object-oriented Figure renders with Agg and stays out of pyplot's global figure registry.
+    # A fresh figure per call keeps concurrent sessions from drawing over each other.
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.semilogx(sizes, passing, marker='o', color='green')
+    ax.set_xlim(0.01, 10)
+    ax.set_xticks([0.01, 0.1, 1, 10])
+    ax.get_xaxis().set_major_formatter(ScalarFormatter())
+    ax.ticklabel_format(axis='x', style='plain')
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.set_xlabel("Sieve Size (mm) [Log Scale]")
+    ax.set_ylabel("Cumulative % Passing")
+    ax.set_title("Particle Size Distribution Curve")
+    return fig
+
+def classify(D10):
+    return (
+        "Fine soil (silt/clay)" if D10 < 0.075 else
+        "Sand" if D10 < 2 else
+        "Gravel or Coarse soil"
+    )
+
+@st.cache_data
+def render_plot(weights, sieves):
+    cols = compute_sieve(weights, sieves)[0]
+
+    # Plot, filtering out pan (0 mm)
+    on_sieve = cols['Sieve Size (mm)'] > 0
+
+    fig = make_fig(cols['Sieve Size (mm)'][on_sieve], cols['% Passing'][on_sieve])
+
+    # One figure, two encodes: a full-resolution trimmed PNG for the page, and the
+    # untrimmed 8x5" figure at 50 dpi, exactly the 400x250 PDF embed size
+    page_buf = BytesIO()
+    fig.savefig(page_buf, format='png', dpi=200, bbox_inches='tight')
+    pdf_buf = BytesIO()
+    fig.savefig(pdf_buf, format='png', dpi=50)
+    return page_buf.getvalue(), pdf_buf.getvalue()
+
+def create_pdf(cols, D10, D30, D60, Cu, Cc, classification, plot_png):
+    # Imported lazily so the input form renders without paying reportlab's import cost
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
@@ -28,14 +144,10 @@ def create_pdf(df, D10, D30, D60, Cu, Cc, classification, plot_fig):
 
     # Table
     data = [["Sieve Size (mm)", "Weight Retained (g)", "% Retained", "Cum. % Retained", "% Passing"]]
-    for _, row in df.iterrows():
-        data.append([
-            f"{row['Sieve Size (mm)']:.3f}",
-            f"{row['Weight Retained (g)']:.2f}",
-            f"{row['% Retained']:.2f}",
-            f"{row['Cumulative % Retained']:.2f}",
-            f"{row['% Passing']:.2f}"
-        ])
+    # One format call per row instead of one per cell
+    fmt = '{:.3f}|{:.2f}|{:.2f}|{:.2f}|{:.2f}'.format
+    for row in zip(*cols.values()):
+        data.append(fmt(*row).split('|'))
 
     table = Table(data, hAlign='LEFT')
     table.setStyle(TableStyle([
@@ -60,68 +172,57 @@ def create_pdf(df, D10, D30, D60, Cu, Cc, classification, plot_fig):
     elements.append(Paragraph(interpretation, styles['BodyText']))
     elements.append(Spacer(1, 12))
 
-    # Plot
-    img_buffer = BytesIO()
-    plot_fig.savefig(img_buffer, format='png', bbox_inches='tight')
-    img_buffer.seek(0)
-
-    img = Image(img_buffer, width=400, height=250)
+    # Plot. A fresh file-like wrapper lets the flowable build its ImageReader once;
+    # it does not accept an ImageReader directly.
+    img = Image(BytesIO(plot_png), width=400, height=250)
     elements.append(img)
 
     doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+# Keyed on the raw file bytes, since the uploader keeps its file across every rerun
+@st.cache_data
+def analyze_csv(data, sieves):
+    W = np.loadtxt(BytesIO(data), delimiter=',', ndmin=2, dtype=np.float64)
+    if W.shape[1] != len(sieves):
+        raise ValueError(f"Each row must have exactly {len(sieves)} values.")
+
+    D = batch_analyze(W, np.asarray(sieves, dtype=np.float64))
+    Cu, Cc = coefficients(D[:, 0], D[:, 1], D[:, 2])
+    return {'D10 (mm)': D[:, 0], 'D30 (mm)': D[:, 1], 'D60 (mm)': D[:, 2], 'Cu': Cu, 'Cc': Cc}
+
+# st.download_button needs the PDF up front on every rerun, so cache it per input
+@st.cache_data
+def get_pdf_bytes(weights, sieves):
+    cols, D10, D30, D60, Cu, Cc = compute_sieve(weights, sieves)
+    plot_png = render_plot(weights, sieves)[1]
+    return create_pdf(cols, D10, D30, D60, Cu, Cc, classify(D10), plot_png)
 
 if user_input:
     try:
-        weight_retained = [float(x.strip()) for x in user_input.split(',')]
-        if len(weight_retained) != len(sieve_sizes):
-            st.error(f"Please enter exactly {len(sieve_sizes)} values.")
+        # np.fromstring reads a blank field as -1.0 and drops an empty trailing one, so blank
+        # fields are rejected up front. It raises on other non-numeric tokens, and the parsed
+        # size is checked against the field count as well.
+        fields = user_input.split(',')
+        weight_retained = np.empty(0)
+        if all(f.strip() for f in fields):
+            try:
+                weight_retained = np.fromstring(user_input, dtype=np.float64, sep=',')
+            except ValueError:
+                pass
+        if weight_retained.size != len(sieve_sizes) or weight_retained.size != len(fields):
+            st.error(f"Please enter exactly {len(sieve_sizes)} numeric values.")
         else:
-            df = pd.DataFrame({
-                'Sieve Size (mm)': sieve_sizes,
-                'Weight Retained (g)': weight_retained
-            })
-
-            total_weight = df['Weight Retained (g)'].sum()
-            df['% Retained'] = (df['Weight Retained (g)'] / total_weight) * 100
-            df['Cumulative % Retained'] = df['% Retained'].cumsum()
-            df['% Passing'] = 100 - df['Cumulative % Retained']
+            weights, sieves = tuple(weight_retained), tuple(sieve_sizes)
+            cols, D10, D30, D60, Cu, Cc = compute_sieve(weights, sieves)
 
             st.subheader("Sieve Analysis Table")
-            st.dataframe(df)
-
-            # Filter out pan (0 mm) for plotting
-            df_plot = df[df['Sieve Size (mm)'] > 0]
+            st.dataframe(cols)
 
             # Plot
-            fig, ax = plt.subplots(figsize=(8, 5))
-            ax.semilogx(df_plot['Sieve Size (mm)'], df_plot['% Passing'], marker='o', color='green')
-            ax.set_xlim(0.01, 10)
-            ax.set_xticks([0.01, 0.1, 1, 10])
-            ax.get_xaxis().set_major_formatter(plt.ScalarFormatter())
-            ax.ticklabel_format(axis='x', style='plain')
-            ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-            ax.set_xlabel("Sieve Size (mm) [Log Scale]")
-            ax.set_ylabel("Cumulative % Passing")
-            ax.set_title("Particle Size Distribution Curve")
-            st.pyplot(fig)
-
-            # Interpretation
-            def interpolate_diameter(percent):
-                return np.interp(percent, df['% Passing'][::-1], df['Sieve Size (mm)'][::-1])
-
-            D10 = interpolate_diameter(10)
-            D30 = interpolate_diameter(30)
-            D60 = interpolate_diameter(60)
-            Cu = D60 / D10 if D10 else float('inf')
-            Cc = (D30 ** 2) / (D10 * D60) if D10 and D60 else float('inf')
-
-            classification = (
-                "Fine soil (silt/clay)" if D10 < 0.075 else
-                "Sand" if D10 < 2 else
-                "Gravel or Coarse soil"
-            )
+            st.image(render_plot(weights, sieves)[0])
+
+            classification = classify(D10)
 
             st.subheader("Interpretation")
             st.markdown(f"""
@@ -133,8 +234,21 @@ if user_input:
             - **Classification based on D10** = {classification}
             """)
 
-            pdf_bytes = create_pdf(df, D10, D30, D60, Cu, Cc, classification, fig)
+            pdf_bytes = get_pdf_bytes(weights, sieves)
             st.download_button("📄 Download PDF Report", data=pdf_bytes, file_name="sieve_analysis_report.pdf", mime="application/pdf")
 
     except Exception as e:
         st.error(f"Error: {e}")
+
+st.subheader("Batch Analysis")
+uploaded = st.file_uploader(
+    f"CSV with one sample per row and {len(sieve_sizes)} weights (g) per row, no header",
+    type="csv"
+)
+
+if uploaded is not None:
+    try:
+        st.dataframe(analyze_csv(uploaded.getvalue(), tuple(sieve_sizes)))
+
+    except Exception as e:
+        st.error(f"Error: {e}")